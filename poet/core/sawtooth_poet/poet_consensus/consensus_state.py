@@ -19,10 +19,10 @@ import math
 import logging
 import collections
 import itertools
+import struct
+import sys
 import threading
 
-import cbor
-
 from sawtooth_poet.poet_consensus import utils
 from sawtooth_poet.poet_consensus.poet_settings_view import PoetSettingsView
 from sawtooth_poet.poet_consensus.signup_info import SignupInfo
@@ -32,23 +32,118 @@ from sawtooth_poet_common.validator_registry_view.validator_registry_view \
 
 LOGGER = logging.getLogger(__name__)
 
-ValidatorState = \
-    collections.namedtuple(
-        'ValidatorState',
+
+# Each string in a serialized consensus state is preceded by a header
+# holding the string kind and the length of the encoded string
+_STRING_HEADER = struct.Struct('<BI')
+_TEXT_STRING = 0
+_HEX_STRING = 1
+
+
+def _pack_string(value):
+    """Encodes a string for a serialized consensus state.  Validator IDs and
+    PoET public keys are lower-case hex strings, so a string that can be
+    recovered exactly by bytes.hex() is stored as the bytes it encodes, which
+    is half the size.  Any other string is stored as UTF-8.
+
+    Returns:
+        bytes: The string header followed by the encoded string
+    """
+    try:
+        encoded = bytes.fromhex(value)
+    except ValueError:
+        encoded = None
+
+    if encoded is not None and encoded.hex() == value:
+        kind = _HEX_STRING
+    else:
+        kind = _TEXT_STRING
+        encoded = value.encode()
+
+    return _STRING_HEADER.pack(kind, len(encoded)) + encoded
+
+
+def _unpack_string(view, offset):
+    """Decodes a string encoded by _pack_string.
+
+    Args:
+        view (memoryview): The serialized consensus state
+        offset (int): The offset of the string header within view
+
+    Returns:
+        tuple: The string and the offset immediately following it
+
+    Raises:
+        ValueError: The string is not validly encoded
+        struct.error: view is too short to hold the string header
+    """
+    kind, length = _STRING_HEADER.unpack_from(view, offset)
+    offset += _STRING_HEADER.size
+    end = offset + length
+    if end > len(view):
+        raise ValueError('string extends past the end of the buffer')
+
+    if kind == _HEX_STRING:
+        value = view[offset:end].hex()
+    elif kind == _TEXT_STRING:
+        value = str(view[offset:end], 'utf-8')
+    else:
+        raise ValueError('string kind ({}) is invalid'.format(kind))
+
+    return value, end
+
+
+class _Abbreviated(object):
+    """Wraps an ID or key for logging so that it is only abbreviated to its
+    first and last eight characters if the log message is actually
+    formatted.
+    """
+
+    __slots__ = ['_value']
+
+    def __init__(self, value):
+        self._value = value
+
+    def __str__(self):
+        return '{}...{}'.format(self._value[:8], self._value[-8:])
+
+
+class ValidatorState(object):
+    """Represents the state for a single validator at a point in time.  The
+    validator registry can be large, so the validator state uses __slots__
+    to avoid carrying a per-object attribute dictionary.
+
+    The PoET public key is interned when it is set by ConsensusState so that
+    validator states sharing a key also share a single copy of the string.
+
+    Attributes:
+        key_block_claim_count (int): The number of blocks that the validator
+            has claimed using the current PoET public key
+        poet_public_key (str): The current PoET public key for the validator
+        total_block_claim_count (int): The total number of the blocks that
+            the validator has claimed
+    """
+
+    __slots__ = \
         ['key_block_claim_count',
          'poet_public_key',
-         'total_block_claim_count'
-         ])
-""" Instead of creating a full-fledged class, let's use a named tuple for
-the validator state.  The validator state represents the state for a single
-validator at a point in time.  A validator state object contains:
+         'total_block_claim_count']
+
+    def __init__(self,
+                 key_block_claim_count,
+                 poet_public_key,
+                 total_block_claim_count):
+        self.key_block_claim_count = key_block_claim_count
+        self.poet_public_key = poet_public_key
+        self.total_block_claim_count = total_block_claim_count
 
-key_block_claim_count (int): The number of blocks that the validator has
-claimed using the current PoET public key
-poet_public_key (str): The current PoET public key for the validator
-total_block_claim_count (int): The total number of the blocks that the
-    validator has claimed
-"""
+    def __repr__(self):
+        return \
+            'ValidatorState(key_block_claim_count={}, poet_public_key={}, ' \
+            'total_block_claim_count={})'.format(
+                self.key_block_claim_count,
+                self.poet_public_key,
+                self.total_block_claim_count)
 
 
 class ConsensusState(object):
@@ -66,6 +161,16 @@ class ConsensusState(object):
     # MINIMUM_WAIT_TIME must match the constants in the enclaves
     MINIMUM_WAIT_TIME = 1.0
 
+    # The serialized form of the consensus state is a header (version,
+    # aggregate local mean, total block claim count, number of population
+    # samples, and number of validators), followed by the population samples,
+    # followed by a record per validator (ID, PoET public key, key block claim
+    # count, and total block claim count).  All values are little-endian.
+    _SERIALIZATION_VERSION = 2
+    _HEADER = struct.Struct('<BdQII')
+    _POPULATION_SAMPLE = struct.Struct('<dd')
+    _VALIDATOR_COUNTS = struct.Struct('<QQ')
+
     _BlockInfo = \
         collections.namedtuple(
             '_BlockInfo',
@@ -187,9 +292,8 @@ class ConsensusState(object):
                         validator_id=block.header.signer_public_key)
 
                 LOGGER.debug(
-                    'We need to build consensus state for block: %s...%s',
-                    current_id[:8],
-                    current_id[-8:])
+                    'We need to build consensus state for block: %s',
+                    _Abbreviated(current_id))
 
                 blocks[current_id] = \
                     ConsensusState._BlockInfo(
@@ -276,38 +380,17 @@ class ConsensusState(object):
 
     @staticmethod
     def _check_validator_state(validator_state):
-        if not isinstance(
-                validator_state.key_block_claim_count, int) \
-                or validator_state.key_block_claim_count < 0:
-            raise \
-                ValueError(
-                    'key_block_claim_count ({}) is invalid'.format(
-                        validator_state.key_block_claim_count))
-
-        if not isinstance(
-                validator_state.poet_public_key, str) \
-                or len(validator_state.poet_public_key) < 1:
+        # The claim counts are unsigned and the PoET public key is a string
+        # by construction of the serialized form, so all that remains is
+        # that the key must not be empty and the key block claim count can
+        # be no more than the total block claim count.
+        if not (validator_state.poet_public_key
+                and validator_state.key_block_claim_count <=
+                validator_state.total_block_claim_count):
             raise \
                 ValueError(
-                    'poet_public_key ({}) is invalid'.format(
-                        validator_state.poet_public_key))
-
-        if not isinstance(
-                validator_state.total_block_claim_count, int) \
-                or validator_state.total_block_claim_count < 0:
-            raise \
-                ValueError(
-                    'total_block_claim_count ({}) is invalid'.format(
-                        validator_state.total_block_claim_count))
-
-        if validator_state.key_block_claim_count > \
-                validator_state.total_block_claim_count:
-            raise \
-                ValueError(
-                    'total_block_claim_count ({}) is less than '
-                    'key_block_claim_count ({})'.format(
-                        validator_state.total_block_claim_count,
-                        validator_state.key_block_claim_count))
+                    'validator state ({!r}) is invalid'.format(
+                        validator_state))
 
     @staticmethod
     def _block_for_id(block_id, block_cache):
@@ -488,17 +571,20 @@ class ConsensusState(object):
         """
 
         # Fetch the validator state.  If it doesn't exist, then create a
-        # default validator state object and store it for further requests
-        validator_state = self._validators.get(validator_info.id)
+        # default validator state object and store it for further requests.
+        # The validator ID is a str, which caches its hash, so the insert on
+        # a miss does not hash the key again.
+        validator_id = validator_info.id
+        validator_state = self._validators.get(validator_id)
 
         if validator_state is None:
             validator_state = \
                 ValidatorState(
                     key_block_claim_count=0,
-                    poet_public_key=validator_info.signup_info.
-                    poet_public_key,
+                    poet_public_key=sys.intern(
+                        validator_info.signup_info.poet_public_key),
                     total_block_claim_count=0)
-            self._validators[validator_info.id] = validator_state
+            self._validators[validator_id] = validator_state
 
         return validator_state
 
@@ -538,43 +624,35 @@ class ConsensusState(object):
                 poet_settings_view.population_estimate_sample_size:
             self._population_samples.popleft()
 
-        # We need to fetch the current state for the validator
+        # We need to fetch the current state for the validator.  The
+        # validator state object is owned by our validator map, so we update
+        # it in place.
         validator_state = \
             self.get_validator_state(validator_info=validator_info)
+        poet_public_key = validator_info.signup_info.poet_public_key
 
-        total_block_claim_count = \
-            validator_state.total_block_claim_count + 1
+        validator_state.total_block_claim_count += 1
 
         # If the PoET public keys match, then we are doing a simple statistics
         # update
-        if validator_info.signup_info.poet_public_key == \
-                validator_state.poet_public_key:
-            key_block_claim_count = \
-                validator_state.key_block_claim_count + 1
+        if poet_public_key == validator_state.poet_public_key:
+            validator_state.key_block_claim_count += 1
 
         # Otherwise, we are resetting statistics for the validator.  This
         # includes using the validator info's transaction ID to get the block
         # number of the block that committed the validator registry
         # transaction.
         else:
-            key_block_claim_count = 1
+            validator_state.key_block_claim_count = 1
+            validator_state.poet_public_key = sys.intern(poet_public_key)
 
         LOGGER.debug(
-            'Update state for %s (ID=%s...%s): PPK=%s...%s, KBCC=%d, TBCC=%d',
+            'Update state for %s (ID=%s): PPK=%s, KBCC=%d, TBCC=%d',
             validator_info.name,
-            validator_info.id[:8],
-            validator_info.id[-8:],
-            validator_info.signup_info.poet_public_key[:8],
-            validator_info.signup_info.poet_public_key[-8:],
-            key_block_claim_count,
-            total_block_claim_count)
-
-        # Update our copy of the validator state
-        self._validators[validator_info.id] = \
-            ValidatorState(
-                key_block_claim_count=key_block_claim_count,
-                poet_public_key=validator_info.signup_info.poet_public_key,
-                total_block_claim_count=total_block_claim_count)
+            _Abbreviated(validator_info.id),
+            _Abbreviated(poet_public_key),
+            validator_state.key_block_claim_count,
+            validator_state.total_block_claim_count)
 
     def signup_attempt_timed_out(self,
                                  signup_nonce,
@@ -958,19 +1036,28 @@ class ConsensusState(object):
         Returns:
             bytes: serialized version of the consensus state object
         """
-        # For serialization, the easiest thing to do is to convert ourself to
-        # a dictionary and convert to CBOR.  The deque object cannot be
-        # automatically serialized, so convert it to a list first.  We will
-        # reconstitute it to a deque upon parsing.
-        self_dict = {
-            '_aggregate_local_mean': self._aggregate_local_mean,
-            '_population_samples': list(self._population_samples),
-            '_total_block_claim_count': self._total_block_claim_count,
-            '_validators': self._validators
-        }
-        return cbor.dumps(self_dict)
-
-    def parse_from_bytes(self, buffer):
+        parts = [
+            ConsensusState._HEADER.pack(
+                ConsensusState._SERIALIZATION_VERSION,
+                self._aggregate_local_mean,
+                self._total_block_claim_count,
+                len(self._population_samples),
+                len(self._validators))
+        ]
+        parts.extend(
+            ConsensusState._POPULATION_SAMPLE.pack(*sample)
+            for sample in self._population_samples)
+        for validator_id, validator_state in self._validators.items():
+            parts.append(_pack_string(validator_id))
+            parts.append(_pack_string(validator_state.poet_public_key))
+            parts.append(
+                ConsensusState._VALIDATOR_COUNTS.pack(
+                    validator_state.key_block_claim_count,
+                    validator_state.total_block_claim_count))
+
+        return b''.join(parts)
+
+    def parse_from_bytes(self, buffer, trusted=False):
         """Returns a consensus state object re-created from the serialized
         consensus state provided.
 
@@ -978,6 +1065,8 @@ class ConsensusState(object):
             buffer (bytes): A byte string representing the serialized
                 version of a consensus state to re-create.  This was created
                 by a previous call to serialize_to_bytes
+            trusted (bool): Whether the buffer comes from our own storage, in
+                which case the per-validator state checks are skipped
 
         Returns:
             ConsensusState: object representing the serialized byte string
@@ -987,85 +1076,105 @@ class ConsensusState(object):
             ValueError: failure to parse into a valid ConsensusState object
         """
         try:
-            # Deserialize the CBOR back into a dictionary and set the simple
-            # fields, doing our best to check validity.
-            self_dict = cbor.loads(buffer)
+            # Walk the buffer in place, setting the simple fields first and
+            # doing our best to check validity.
+            view = memoryview(buffer)
 
-            if not isinstance(self_dict, dict):
+            if not view or \
+                    view[0] != ConsensusState._SERIALIZATION_VERSION:
                 raise \
                     ValueError(
                         'buffer is not a valid serialization of a '
                         'ConsensusState object')
 
-            self._aggregate_local_mean = \
-                float(self_dict['_aggregate_local_mean'])
+            (_,
+             aggregate_local_mean,
+             total_block_claim_count,
+             population_sample_count,
+             validator_count) = ConsensusState._HEADER.unpack_from(view)
+            offset = ConsensusState._HEADER.size
+
+            # The floating-point values must be finite and non-negative.  A
+            # single chained comparison covers this as NaN fails it.  The
+            # counts are unsigned, so they need no checks.
+            if not 0.0 <= aggregate_local_mean < math.inf:
+                raise \
+                    ValueError(
+                        'aggregate_local_mean ({}) is invalid'.format(
+                            aggregate_local_mean))
+
+            self._aggregate_local_mean = aggregate_local_mean
             self._local_mean = None
             self._population_samples = collections.deque()
-            for sample in self_dict['_population_samples']:
-                (duration, local_mean) = [float(value) for value in sample]
-                if not math.isfinite(duration) or duration < 0:
-                    raise \
-                        ValueError(
-                            'duration ({}) is invalid'.format(duration))
-                if not math.isfinite(local_mean) or local_mean < 0:
+            for _ in range(population_sample_count):
+                (duration, local_mean) = \
+                    ConsensusState._POPULATION_SAMPLE.unpack_from(
+                        view, offset)
+                offset += ConsensusState._POPULATION_SAMPLE.size
+                if not (0.0 <= duration < math.inf and
+                        0.0 <= local_mean < math.inf):
                     raise \
                         ValueError(
-                            'local_mean ({}) is invalid'.format(local_mean))
+                            'population sample (duration={}, local_mean={}) '
+                            'is invalid'.format(duration, local_mean))
                 self._population_samples.append(
                     ConsensusState._PopulationSample(
                         duration=duration,
                         local_mean=local_mean))
-            self._total_block_claim_count = \
-                int(self_dict['_total_block_claim_count'])
-            validators = self_dict['_validators']
-
-            if not math.isfinite(self.aggregate_local_mean) or \
-                    self.aggregate_local_mean < 0:
-                raise \
-                    ValueError(
-                        'aggregate_local_mean ({}) is invalid'.format(
-                            self.aggregate_local_mean))
-            if self.total_block_claim_count < 0:
-                raise \
-                    ValueError(
-                        'total_block_claim_count ({}) is invalid'.format(
-                            self.total_block_claim_count))
-
-            if not isinstance(validators, dict):
-                raise ValueError('_validators is not a dict')
-
-            # Now walk through all of the key/value pairs in the the
-            # validators dictionary and reconstitute the validator state from
-            # them, again trying to validate the data the best we can.  The
-            # only catch is that because the validator state objects are named
-            # tuples, cbor.dumps() treated them as tuples and so we lost the
-            # named part.  When re-creating the validator state, are going to
-            # leverage the namedtuple's _make method.
+            self._total_block_claim_count = total_block_claim_count
 
+            # Now read the validator records and reconstitute the validator
+            # state from them, and then validate the validator states the
+            # best we can unless the buffer is trusted.
             self._validators = {}
-            for key, value in validators.items():
-                validator_state = ValidatorState._make(value)
-
-                self._check_validator_state(validator_state)
-                self._validators[str(key)] = validator_state
-
-        except (LookupError, ValueError, KeyError, TypeError) as error:
+            for _ in range(validator_count):
+                validator_id, offset = _unpack_string(view, offset)
+                poet_public_key, offset = _unpack_string(view, offset)
+                poet_public_key = sys.intern(poet_public_key)
+                (key_block_claim_count, validator_block_claim_count) = \
+                    ConsensusState._VALIDATOR_COUNTS.unpack_from(
+                        view, offset)
+                offset += ConsensusState._VALIDATOR_COUNTS.size
+                self._validators[validator_id] = \
+                    ValidatorState(
+                        key_block_claim_count,
+                        poet_public_key,
+                        validator_block_claim_count)
+
+            if offset != len(view):
+                raise ValueError('buffer has trailing data')
+
+            if not trusted:
+                for validator_state in self._validators.values():
+                    self._check_validator_state(validator_state)
+
+        except (LookupError, ValueError, TypeError, struct.error) as error:
             raise \
                 ValueError(
                     'Error parsing ConsensusState buffer: {}'.format(error))
 
-    def __str__(self):
-        validators = \
-            ['{}: {{KBCC={}, PPK={}, TBCC={} }}'.format(
-                key[:8],
-                value.key_block_claim_count,
-                value.poet_public_key[:8],
-                value.total_block_claim_count) for
-             key, value in self._validators.items()]
+    def dump_validators(self):
+        """Returns a human-readable rendering of the state of every validator
+        in the consensus state, intended for diagnostics.
+
+        Returns:
+            str: The validator state, keyed by abbreviated validator ID
+        """
+        return \
+            ', '.join(
+                '{}: {{KBCC={}, PPK={}, TBCC={} }}'.format(
+                    key[:8],
+                    value.key_block_claim_count,
+                    value.poet_public_key[:8],
+                    value.total_block_claim_count) for
+                key, value in self._validators.items())
 
+    def __str__(self):
+        # Only report the number of validators as the validator map can be
+        # large.  Use dump_validators() for the full validator state.
         return \
             'ALM={:.4f}, TBCC={}, PS={}, V={}'.format(
                 self.aggregate_local_mean,
                 self.total_block_claim_count,
                 self._population_samples,
-                validators)
+                len(self._validators))
@@ -99,7 +99,8 @@ class ConsensusStateStore(MutableMapping):
         try:
             consensus_state = ConsensusState()
             consensus_state.parse_from_bytes(
-                buffer=serialized_consensus_state)
+                buffer=serialized_consensus_state,
+                trusted=True)
             return consensus_state
         except ValueError as error:
             raise \
@@ -128,7 +129,8 @@ class ConsensusStateStore(MutableMapping):
                 serialized_consensus_state = self._store_db[block_id]
                 consensus_state = ConsensusState()
                 consensus_state.parse_from_bytes(
-                    buffer=serialized_consensus_state)
+                    buffer=serialized_consensus_state,
+                    trusted=True)
                 out.append(
                     '{}...{}: {{{}}}'.format(
                         block_id[:8],
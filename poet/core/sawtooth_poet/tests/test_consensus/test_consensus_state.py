@@ -18,8 +18,6 @@ import random
 from unittest import TestCase
 from unittest import mock
 
-import cbor
-
 from sawtooth_poet.poet_consensus import consensus_state
 
 from sawtooth_poet_common.protobuf.validator_registry_pb2 \
@@ -141,125 +139,40 @@ class TestConsensusState(TestCase):
         poet_settings_view.population_estimate_sample_size = 50
 
         # Simple deserialization check of buffer
-        for invalid_state in [None, '', 1, 1.1, (), [], {}]:
+        for invalid_buffer in [None, '', 1, b'', b'\x00', b'not a state',
+                               bytes(100)]:
             state = consensus_state.ConsensusState()
             with self.assertRaises(ValueError):
-                state.parse_from_bytes(cbor.dumps(invalid_state))
-
-        # Missing aggregate local mean
-        with mock.patch(
-                'sawtooth_poet.poet_consensus.consensus_state.cbor.loads') \
-                as mock_loads:
-            mock_loads.return_value = {
-                '_population_samples': [(2.718, 3.1415), (1.618, 0.618)],
-                '_total_block_claim_count': 0,
-                '_validators': {}
-            }
-            with self.assertRaises(ValueError):
-                state.parse_from_bytes(b'')
+                state.parse_from_bytes(invalid_buffer)
+
+        # Unknown serialization version
+        state = consensus_state.ConsensusState()
+        serialized = state.serialize_to_bytes()
+        with self.assertRaises(ValueError):
+            state.parse_from_bytes(
+                bytes([serialized[0] + 1]) + serialized[1:])
 
         # Invalid aggregate local mean
-        for invalid_alm in [None, 'not a float', (), [], {}, -1,
-                            float('nan'), float('inf'), float('-inf')]:
+        for invalid_alm in [-1.0, float('nan'), float('inf'), float('-inf')]:
             state = consensus_state.ConsensusState()
-            with mock.patch(
-                    'sawtooth_poet.poet_consensus.consensus_state.cbor.'
-                    'loads') \
-                    as mock_loads:
-                mock_loads.return_value = {
-                    '_aggregate_local_mean': invalid_alm,
-                    '_population_samples': [(2.718, 3.1415), (1.618, 0.618)],
-                    '_total_block_claim_count': 0,
-                    '_validators': {}
-                }
-                with self.assertRaises(ValueError):
-                    state.parse_from_bytes(b'')
-
-        # Missing population samples
-        with mock.patch(
-                'sawtooth_poet.poet_consensus.consensus_state.cbor.loads') \
-                as mock_loads:
-            mock_loads.return_value = {
-                '_aggregate_local_mean': 0.0,
-                '_total_block_claim_count': 0,
-                '_validators': {}
-            }
+            state._aggregate_local_mean = invalid_alm
+            serialized = state.serialize_to_bytes()
             with self.assertRaises(ValueError):
-                state.parse_from_bytes(b'')
+                consensus_state.ConsensusState().parse_from_bytes(serialized)
 
         # Invalid population samples
-        for invalid_ps in [None, 1, 1.0, 'str', (1,), [1],
-                           (1.0, None), (1.0, 'str'), (1.0, ()), (1.0, []),
-                           (1.0, {}),
-                           (1.0, float('nan')), (1.0, float('inf')),
-                           (1.0, float('-inf')), (float('nan'), 1.0),
-                           (float('inf'), 1.0), (float('-inf'), 1.0),
-                           (None, 1.0), ('str', 1.0), ((), 1.0), ([], 1.0),
-                           ({}, 1.0),
-                           [1.0, None], [1.0, 'str'], [1.0, ()], [1.0, []],
-                           [1.0, {}],
-                           [1.0, float('nan')], [1.0, float('inf')],
-                           [1.0, float('-inf')], [float('nan'), 1.0],
-                           [float('inf'), 1.0], [float('-inf'), 1.0],
-                           [None, 1.0], ['str', 1.0], [(), 1.0], [[], 1.0],
-                           [{}, 1.0]]:
+        for invalid_ps in [(1.0, -1.0), (1.0, float('nan')),
+                           (1.0, float('inf')), (1.0, float('-inf')),
+                           (-1.0, 1.0), (float('nan'), 1.0),
+                           (float('inf'), 1.0), (float('-inf'), 1.0)]:
             state = consensus_state.ConsensusState()
-            with mock.patch(
-                    'sawtooth_poet.poet_consensus.consensus_state.cbor.'
-                    'loads') \
-                    as mock_loads:
-                mock_loads.return_value = {
-                    '_aggregate_local_mean': 0.0,
-                    '_population_samples': invalid_ps,
-                    '_total_block_claim_count': 0,
-                    '_validators': {}
-                }
-                with self.assertRaises(ValueError):
-                    state.parse_from_bytes(b'')
-
-        # Missing total block claim count
-        with mock.patch(
-                'sawtooth_poet.poet_consensus.consensus_state.cbor.loads') \
-                as mock_loads:
-            mock_loads.return_value = {
-                '_aggregate_local_mean': 0.0,
-                '_population_samples': [(2.718, 3.1415), (1.618, 0.618)],
-                '_validators': {}
-            }
+            state._population_samples.append(
+                consensus_state.ConsensusState._PopulationSample(
+                    duration=invalid_ps[0],
+                    local_mean=invalid_ps[1]))
+            serialized = state.serialize_to_bytes()
             with self.assertRaises(ValueError):
-                state.parse_from_bytes(b'')
-
-        # Invalid total block claim count
-        for invalid_tbcc in [None, 'not an int', (), [], {}, -1]:
-            state = consensus_state.ConsensusState()
-            with mock.patch(
-                    'sawtooth_poet.poet_consensus.consensus_state.cbor.'
-                    'loads') \
-                    as mock_loads:
-                mock_loads.return_value = {
-                    '_aggregate_local_mean': 0.0,
-                    '_population_samples': [(2.718, 3.1415), (1.618, 0.618)],
-                    '_total_block_claim_count': invalid_tbcc,
-                    '_validators': {}
-                }
-                with self.assertRaises(ValueError):
-                    state.parse_from_bytes(b'')
-
-        # Invalid validators
-        for invalid_validators in [None, '', 1, 1.1, (), []]:
-            state = consensus_state.ConsensusState()
-            with mock.patch(
-                    'sawtooth_poet.poet_consensus.consensus_state.cbor.'
-                    'loads') \
-                    as mock_loads:
-                mock_loads.return_value = {
-                    '_aggregate_local_mean': 0.0,
-                    '_population_samples': [(2.718, 3.1415), (1.618, 0.618)],
-                    '_total_block_claim_count': 0,
-                    '_validators': invalid_validators
-                }
-                with self.assertRaises(ValueError):
-                    state.parse_from_bytes(b'')
+                consensus_state.ConsensusState().parse_from_bytes(serialized)
 
         state = consensus_state.ConsensusState()
         wait_certificate = mock.Mock()
@@ -286,72 +199,32 @@ class TestConsensusState(TestCase):
             doppelganger_state.parse_from_bytes(
                 state.serialize_to_bytes()[1:])
 
-        # Test invalid key block claim counts in validator state
-        for invalid_kbcc in [None, (), [], {}, '1', 1.1, -1]:
-            state = consensus_state.ConsensusState()
-            with mock.patch(
-                    'sawtooth_poet.poet_consensus.consensus_state.cbor.'
-                    'loads') as mock_loads:
-                mock_loads.return_value = {
-                    '_aggregate_local_mean': 0.0,
-                    '_population_samples': [(2.718, 3.1415), (1.618, 0.618)],
-                    '_total_block_claim_count': 0,
-                    '_validators': {
-                        'validator_001': [invalid_kbcc, 'ppk_001', 0]
-                    }
-                }
-                with self.assertRaises(ValueError):
-                    state.parse_from_bytes(b'')
-
-        # Test invalid PoET public key in validator state
-        for invalid_ppk in [None, (), [], {}, 1, 1.1, '']:
-            state = consensus_state.ConsensusState()
-            with mock.patch(
-                    'sawtooth_poet.poet_consensus.consensus_state.cbor.'
-                    'loads') as mock_loads:
-                mock_loads.return_value = {
-                    '_aggregate_local_mean': 0.0,
-                    '_population_samples': [(2.718, 3.1415), (1.618, 0.618)],
-                    '_total_block_claim_count': 0,
-                    '_validators': {
-                        'validator_001': [0, invalid_ppk, 0]
-                    }
-                }
-                with self.assertRaises(ValueError):
-                    state.parse_from_bytes(b'')
-
-        # Test total block claim count in validator state
-        for invalid_tbcc in [None, (), [], {}, '1', 1.1, -1]:
+        # Append data to the serialized value on purpose
+        with self.assertRaises(ValueError):
+            doppelganger_state.parse_from_bytes(
+                state.serialize_to_bytes() + b'\x00')
+
+        # Test invalid PoET public key in validator state and total block
+        # claim count < key block claim count
+        for invalid_validator_state in [
+                consensus_state.ValidatorState(
+                    key_block_claim_count=0,
+                    poet_public_key='',
+                    total_block_claim_count=0),
+                consensus_state.ValidatorState(
+                    key_block_claim_count=2,
+                    poet_public_key='ppk_001',
+                    total_block_claim_count=1)]:
             state = consensus_state.ConsensusState()
-            with mock.patch(
-                    'sawtooth_poet.poet_consensus.consensus_state.cbor.'
-                    'loads') as mock_loads:
-                mock_loads.return_value = {
-                    '_aggregate_local_mean': 0.0,
-                    '_population_samples': [(2.718, 3.1415), (1.618, 0.618)],
-                    '_total_block_claim_count': 0,
-                    '_validators': {
-                        'validator_001': [0, 'ppk_001', invalid_tbcc]
-                    }
-                }
-                with self.assertRaises(ValueError):
-                    state.parse_from_bytes(b'')
-
-        # Test with total block claim count < key block claim count
-        state = consensus_state.ConsensusState()
-        with mock.patch(
-                'sawtooth_poet.poet_consensus.consensus_state.cbor.'
-                'loads') as mock_loads:
-            mock_loads.return_value = {
-                '_aggregate_local_mean': 0.0,
-                '_population_samples': [(2.718, 3.1415), (1.618, 0.618)],
-                '_total_block_claim_count': 0,
-                '_validators': {
-                    'validator_001': [2, 'ppk_001', 1]
-                }
-            }
+            state._validators['validator_001'] = invalid_validator_state
+            serialized = state.serialize_to_bytes()
             with self.assertRaises(ValueError):
-                state.parse_from_bytes(b'')
+                consensus_state.ConsensusState().parse_from_bytes(serialized)
+
+            # A trusted buffer skips the validator state checks
+            consensus_state.ConsensusState().parse_from_bytes(
+                serialized,
+                trusted=True)
 
         # Simple serialization of new consensus state and then deserialize
         # and compare
@@ -450,6 +323,66 @@ class TestConsensusState(TestCase):
             validator_state.total_block_claim_count,
             doppleganger_validator_state.total_block_claim_count)
 
+    def test_serialize_hex_values(self):
+        """Verify that validator IDs and PoET public keys survive a round
+        trip through serialization whether or not they are lower-case hex
+        strings, and that hex strings are stored as the bytes they encode.
+        """
+        poet_settings_view = mock.Mock()
+        poet_settings_view.population_estimate_sample_size = 50
+
+        wait_certificate = mock.Mock()
+        wait_certificate.duration = 3.14
+        wait_certificate.local_mean = 5.0
+
+        validator_infos = [
+            ValidatorInfo(
+                id='0123456789abcdef',
+                signup_info=SignUpInfo(
+                    poet_public_key='fedcba9876543210')),
+            ValidatorInfo(
+                id='0123456789ABCDEF',
+                signup_info=SignUpInfo(
+                    poet_public_key='not hex')),
+            ValidatorInfo(
+                id='validator_003',
+                signup_info=SignUpInfo(
+                    poet_public_key='abc'))
+        ]
+
+        state = consensus_state.ConsensusState()
+        for validator_info in validator_infos:
+            state.validator_did_claim_block(
+                validator_info=validator_info,
+                wait_certificate=wait_certificate,
+                poet_settings_view=poet_settings_view)
+
+        serialized = state.serialize_to_bytes()
+        self.assertIn(bytes.fromhex('0123456789abcdef'), serialized)
+        self.assertIn(bytes.fromhex('fedcba9876543210'), serialized)
+        self.assertNotIn(b'0123456789abcdef', serialized)
+        self.assertNotIn(b'fedcba9876543210', serialized)
+
+        doppelganger_state = consensus_state.ConsensusState()
+        doppelganger_state.parse_from_bytes(serialized)
+
+        for validator_info in validator_infos:
+            validator_state = \
+                state.get_validator_state(validator_info=validator_info)
+            doppelganger_validator_state = \
+                doppelganger_state.get_validator_state(
+                    validator_info=validator_info)
+
+            self.assertEqual(
+                validator_state.key_block_claim_count,
+                doppelganger_validator_state.key_block_claim_count)
+            self.assertEqual(
+                validator_state.poet_public_key,
+                doppelganger_validator_state.poet_public_key)
+            self.assertEqual(
+                validator_state.total_block_claim_count,
+                doppelganger_validator_state.total_block_claim_count)
+
     def test_local_mean(self):
         """Verify that the consensus state properly computes the local mean
         during both the bootstrapping phase (i.e., before there are enough